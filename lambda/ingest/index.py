@@ -1,130 +1,402 @@
 """Ingest Lambda – accepts log entries via POST and stores them in DynamoDB.
 
 Logging strategy (per alexwlchan.net/2018/error-logging-in-lambdas):
-The incoming event is only logged when the handler raises an exception,
-keeping CloudWatch costs down during normal operation.
+The incoming event is only logged when the handler raises an exception
+and LOG_LEVEL=DEBUG, keeping CloudWatch costs down during normal operation.
 """
 
+import base64
 import json
 import logging
 import os
-import re
-import uuid
+import time
+import zlib
 from datetime import datetime, timezone
+from os import urandom
+from typing import Any
 
 import boto3
+import orjson
+from botocore.config import Config
 
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+# An unknown LOG_LEVEL falls back to INFO instead of failing every cold start
+_log_level = os.environ.get("LOG_LEVEL", "INFO").upper()
+if isinstance(logging.getLevelName(_log_level), int):
+    logger.setLevel(_log_level)
+else:
+    logger.setLevel(logging.INFO)
+    logger.warning("Unknown LOG_LEVEL %r, using INFO", _log_level)
 
 TABLE_NAME = os.environ["TABLE_NAME"]
-dynamodb = boto3.resource("dynamodb")
-table = dynamodb.Table(TABLE_NAME)
-
-VALID_SEVERITIES = {"info", "warning", "error"}
-# Loose ISO 8601 pattern – accepts common variants
-ISO8601_RE = re.compile(
-    r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(\.\d+)?(Z|[+-]\d{2}:?\d{2})?$"
+SHARD_COUNT = int(os.environ["SHARD_COUNT"])
+# Keep the single connection alive across warm invocations so each call
+# reuses the existing TLS session instead of renegotiating.
+_boto_config = Config(
+    tcp_keepalive=True,
+    max_pool_connections=1,
+    retries={"mode": "standard", "max_attempts": 2},
+    # DynamoDB answers in milliseconds; botocore's 60s defaults would let a
+    # stalled endpoint outlast both the 10s init limit and the 10s timeout.
+    # Worst case is 2 attempts x (1s + 3s) = 8s.
+    connect_timeout=1,
+    read_timeout=3,
 )
+# Low-level client rather than boto3.resource: items are already plain
+# strings, so the resource layer's type serializer is pure overhead.
+dynamodb = boto3.client("dynamodb", config=_boto_config)
 
+# Resolve the endpoint and credentials and open the TLS session during init,
+# which runs with a CPU boost, so the first request doesn't pay for them.
+try:
+    dynamodb.describe_table(TableName=TABLE_NAME)
+except Exception:
+    logger.warning("DynamoDB warm-up call failed", exc_info=True)
+
+VALID_SEVERITIES = frozenset(("info", "warning", "error"))
+_VALID_SEVERITIES_STR = ", ".join(sorted(VALID_SEVERITIES))
+
+# BatchWriteItem accepts at most 25 put requests per call
+BATCH_WRITE_SIZE = 25
+MAX_BATCH_ENTRIES = 1000
+MAX_BATCH_RETRIES = 5
+# Stop starting batch writes or backoff sleeps once less than this much of
+# the invocation's time is left, so the response still goes out in time
+RESPONSE_TIME_RESERVE_MS = 2000
+
+# Constant response pieces, built once per cold start
+_JSON_HEADERS = {"Content-Type": "application/json"}
+_INTERNAL_ERROR = {
+    "statusCode": 500,
+    "headers": _JSON_HEADERS,
+    "body": '{"error":"Internal server error"}',
+}
+_INVALID_JSON = {
+    "statusCode": 400,
+    "headers": _JSON_HEADERS,
+    "body": '{"error":"Request body must be valid JSON"}',
+}
+_NOT_AN_OBJECT = {
+    "statusCode": 400,
+    "headers": _JSON_HEADERS,
+    "body": '{"error":"Request body must be a JSON object"}',
+}
+_EMPTY_BATCH = {
+    "statusCode": 400,
+    "headers": _JSON_HEADERS,
+    "body": '{"error":"\'logs\' must be a non-empty array of log entries"}',
+}
+_BATCH_TOO_LARGE = {
+    "statusCode": 400,
+    "headers": _JSON_HEADERS,
+    "body": f'{{"error":"\'logs\' accepts at most {MAX_BATCH_ENTRIES} entries"}}',
+}
+
+_DIGITS = frozenset("0123456789")
+_HEX_DIGITS = frozenset("0123456789abcdef")
+# Client-supplied IDs may be stamped at most this far in the future, so a
+# skewed or forged timestamp can't pin an entry to the top of read_recent
+MAX_ID_CLOCK_SKEW_NS = 5 * 60 * 1_000_000_000
+# Offsets of the digits in "YYYY-MM-DDTHH:MM:SS"
+_DIGIT_OFFSETS = (0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18)
+
+
+def _is_iso8601(value: str) -> bool:
+    """Loose ISO 8601 check – accepts common variants.
+
+    Equivalent to ``YYYY-MM-DD[T ]HH:MM:SS(.f+)?(Z|[+-]HH:?MM)?`` but done
+    with fixed-offset character checks instead of a backtracking regex.
+    """
+    n = len(value)
+    if n < 19:
+        return False
+    for i in _DIGIT_OFFSETS:
+        if value[i] not in _DIGITS:
+            return False
+    if (
+        value[4] != "-"
+        or value[7] != "-"
+        or value[10] not in ("T", " ")
+        or value[13] != ":"
+        or value[16] != ":"
+    ):
+        return False
+
+    # Optional fractional seconds
+    i = 19
+    if i < n and value[i] == ".":
+        i += 1
+        start = i
+        while i < n and value[i] in _DIGITS:
+            i += 1
+        if i == start:
+            return False
+
+    # Optional UTC designator or numeric offset
+    tz = value[i:]
+    if not tz or tz == "Z":
+        return True
+    if tz[0] not in ("+", "-"):
+        return False
+    if len(tz) == 6 and tz[3] == ":":
+        tz = tz[:3] + tz[4:]
+    return len(tz) == 5 and all(c in _DIGITS for c in tz[1:])
+
+
+def _is_log_id(value: str) -> bool:
+    """Check a client-supplied ID has the _new_log_id format.
+
+    The ID is the table's sort key, so it must start with a plausible
+    timestamp to sort correctly among generated IDs.
+    """
+    if len(value) != 32 or not all(c in _HEX_DIGITS for c in value):
+        return False
+    return int(value[:16], 16) <= time.time_ns() + MAX_ID_CLOCK_SKEW_NS
 
-def _validate(body: dict) -> list[str]:
-    """Return a list of validation error messages (empty if valid)."""
-    errors = []
 
+def _validate(body: dict) -> str | None:
+    """Return the first validation error message, or None if valid."""
     # severity is required and must be one of the allowed values
     severity = body.get("severity")
     if severity is None:
-        errors.append("Missing required field: 'severity'")
-    elif severity not in VALID_SEVERITIES:
-        errors.append(
-            f"Invalid severity '{severity}'. Must be one of: {', '.join(sorted(VALID_SEVERITIES))}"
-        )
+        return "Missing required field: 'severity'"
+    if severity not in VALID_SEVERITIES:
+        return f"Invalid severity '{severity}'. Must be one of: {_VALID_SEVERITIES_STR}"
 
-    # message is required
-    if not body.get("message"):
-        errors.append("Missing required field: 'message'")
+    # message is required and stored as-is, so it must be a string
+    message = body.get("message")
+    if not message:
+        return "Missing required field: 'message'"
+    if not isinstance(message, str):
+        return "Invalid message: must be a string"
+
+    # id is optional but must be a string if provided
+    log_id = body.get("id")
+    if log_id is not None:
+        if not isinstance(log_id, str):
+            return "Invalid id: must be a string"
+        if not _is_log_id(log_id):
+            return (
+                f"Invalid id '{log_id}'. Must be 32 lowercase hex characters: "
+                "a nanosecond timestamp (not in the future) and 16 random hex digits."
+            )
 
     # dateTime is optional but must be valid ISO 8601 if provided
     dt = body.get("dateTime")
-    if dt is not None and not ISO8601_RE.match(str(dt)):
-        errors.append(f"Invalid dateTime format: '{dt}'. Expected ISO 8601.")
+    if dt is not None and not _is_iso8601(str(dt)):
+        return f"Invalid dateTime format: '{dt}'. Expected ISO 8601."
+
+    return None
+
+
+def _bad_request(errors: list[str]) -> dict:
+    return {
+        "statusCode": 400,
+        "headers": _JSON_HEADERS,
+        "body": orjson.dumps({"errors": errors}).decode(),
+    }
+
+
+def _new_log_id() -> str:
+    """Time-sortable ID: 64-bit nanosecond timestamp + 64 random bits, as hex.
+
+    Like a ULID, IDs sort by creation time, but hex-encoding urandom output
+    is much cheaper than building and base32-encoding a ULID object. The
+    nanosecond timestamp keeps entries of one batch in order.
+    """
+    return f"{time.time_ns():016x}{urandom(8).hex()}"
+
+
+def _build_item(body: dict) -> dict:
+    """Build the DynamoDB item for a validated log entry."""
+    log_id = body.get("id") or _new_log_id()
+    return {
+        "LogID": {"S": log_id},
+        "DateTime": {
+            "S": body.get("dateTime") or datetime.now(timezone.utc).isoformat()
+        },
+        "Severity": {"S": body["severity"]},
+        "Message": {"S": body["message"]},
+        # Spread writes over the shards by a hash of the ID, so a retried
+        # write with the same ID overwrites the same item
+        "LogType": {"S": f"LOG#{zlib.crc32(log_id.encode()) % SHARD_COUNT}"},
+    }
+
 
-    return errors
+def _batch_write(items: list[dict], deadline: float) -> list[dict]:
+    """Write up to BATCH_WRITE_SIZE items, retrying any UnprocessedItems.
 
+    Returns the items still unwritten when the call fails, the retries run
+    out, or the next backoff would pass ``deadline`` (a time.monotonic()).
+    """
+    requests = [{"PutRequest": {"Item": item}} for item in items]
+    for attempt in range(MAX_BATCH_RETRIES + 1):
+        try:
+            response = dynamodb.batch_write_item(RequestItems={TABLE_NAME: requests})
+        except Exception:
+            logger.exception("BatchWriteItem failed for %d log entries", len(requests))
+            break
+        requests = response.get("UnprocessedItems", {}).get(TABLE_NAME, [])
+        if not requests:
+            return []
+        # Exponential backoff: 50ms, 100ms, 200ms, ...
+        delay = 0.05 * 2**attempt
+        if attempt == MAX_BATCH_RETRIES or time.monotonic() + delay >= deadline:
+            break
+        time.sleep(delay)
+    return [request["PutRequest"]["Item"] for request in requests]
 
-def handler(event, context):
+
+def handler(event: dict, context: Any) -> dict:
     """Lambda Function URL handler for log ingestion."""
     try:
-        return _handle(event)
+        return _handle(event, context)
     except Exception:
-        # Log the full event only on error (cost-saving pattern)
-        logger.exception("Error processing event: %s", json.dumps(event))
-        return {
-            "statusCode": 500,
-            "headers": {"Content-Type": "application/json"},
-            "body": json.dumps({"error": "Internal server error"}),
-        }
+        # Log the full event only on error, and only when debugging: it can
+        # be large, and serializing it delays the error response
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.exception("Error processing event: %s", json.dumps(event))
+        else:
+            logger.exception(
+                "Error processing event (set LOG_LEVEL=DEBUG to log the payload)"
+            )
+        return _INTERNAL_ERROR
 
 
-def _handle(event):
+def _handle(event: dict, context: Any) -> dict:
     # Only accept POST requests
-    method = event.get("requestContext", {}).get("http", {}).get("method", "")
+    # Function URL events always carry requestContext.http.method, so a
+    # direct lookup is cheaper than chained .get() calls with fallback dicts
+    try:
+        method = event["requestContext"]["http"]["method"]
+    except (KeyError, TypeError):
+        method = ""
     if method != "POST":
         return {
             "statusCode": 405,
-            "headers": {"Content-Type": "application/json"},
-            "body": json.dumps({"error": f"Method {method} not allowed. Use POST."}),
+            "headers": _JSON_HEADERS,
+            "body": orjson.dumps(
+                {"error": f"Method {method} not allowed. Use POST."}
+            ).decode(),
         }
 
     # Parse JSON body
     raw_body = event.get("body", "")
     if event.get("isBase64Encoded"):
-        import base64
-
-        raw_body = base64.b64decode(raw_body).decode("utf-8")
+        # orjson parses bytes directly, so skip the utf-8 decode step
+        raw_body = base64.b64decode(raw_body)
 
     try:
-        body = json.loads(raw_body) if raw_body else {}
-    except json.JSONDecodeError:
-        return {
-            "statusCode": 400,
-            "headers": {"Content-Type": "application/json"},
-            "body": json.dumps({"error": "Request body must be valid JSON"}),
-        }
+        body = orjson.loads(raw_body) if raw_body else {}
+    except orjson.JSONDecodeError:
+        return _INVALID_JSON
 
-    # Validate
-    errors = _validate(body)
-    if errors:
-        return {
-            "statusCode": 400,
-            "headers": {"Content-Type": "application/json"},
-            "body": json.dumps({"errors": errors}),
-        }
+    if not isinstance(body, dict):
+        return _NOT_AN_OBJECT
 
-    # Build the DynamoDB item
-    log_id = body.get("id") or str(uuid.uuid4())
-    date_time = body.get("dateTime") or datetime.now(timezone.utc).isoformat()
-
-    item = {
-        "LogID": log_id,
-        "DateTime": date_time,
-        "Severity": body["severity"],
-        "Message": body["message"],
-        # Fixed partition key for the GSI so all logs land in one partition
-        "LogType": "LOG",
-    }
+    # A {"logs": [...]} body is a batch of entries
+    if "logs" in body:
+        return _handle_batch(body["logs"], context)
+
+    # Validate
+    error = _validate(body)
+    if error:
+        return _bad_request([error])
 
-    table.put_item(Item=item)
+    item = _build_item(body)
+    dynamodb.put_item(TableName=TABLE_NAME, Item=item)
 
     return {
         "statusCode": 200,
-        "headers": {"Content-Type": "application/json"},
-        "body": json.dumps(
+        "headers": _JSON_HEADERS,
+        "body": orjson.dumps(
             {
                 "message": "Log entry created",
-                "id": log_id,
-                "dateTime": date_time,
+                "id": item["LogID"]["S"],
+                "dateTime": item["DateTime"]["S"],
+            }
+        ).decode(),
+    }
+
+
+def _handle_batch(entries: object, context: Any) -> dict:
+    if not isinstance(entries, list) or not entries:
+        return _EMPTY_BATCH
+    if len(entries) > MAX_BATCH_ENTRIES:
+        return _BATCH_TOO_LARGE
+
+    # Validate every entry before writing any of them
+    errors = []
+    seen_ids = set()
+    for i, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            errors.append(f"logs[{i}]: Log entry must be a JSON object")
+            continue
+        error = _validate(entry)
+        if error:
+            errors.append(f"logs[{i}]: {error}")
+            continue
+        # BatchWriteItem rejects a request that writes the same key twice
+        log_id = entry.get("id")
+        if log_id:
+            if log_id in seen_ids:
+                errors.append(f"logs[{i}]: Duplicate id '{log_id}' in batch")
+            seen_ids.add(log_id)
+    if errors:
+        return _bad_request(errors)
+
+    items = [_build_item(entry) for entry in entries]
+    deadline = (
+        time.monotonic()
+        + (context.get_remaining_time_in_millis() - RESPONSE_TIME_RESERVE_MS) / 1000
+    )
+    unwritten = []
+    for start in range(0, len(items), BATCH_WRITE_SIZE):
+        chunk = items[start : start + BATCH_WRITE_SIZE]
+        if time.monotonic() >= deadline:
+            unwritten.extend(chunk)
+        else:
+            unwritten.extend(_batch_write(chunk, deadline))
+
+    if not unwritten:
+        return {
+            "statusCode": 200,
+            "headers": _JSON_HEADERS,
+            "body": orjson.dumps(
+                {
+                    "message": "Log entries created",
+                    "count": len(items),
+                    "logs": [
+                        {"id": item["LogID"]["S"], "dateTime": item["DateTime"]["S"]}
+                        for item in items
+                    ],
+                }
+            ).decode(),
+        }
+
+    # Partial failure: report what was stored and which entries to retry.
+    # IDs are unique within a batch, and re-sending a failed entry with its
+    # id overwrites rather than duplicates if it was in fact stored.
+    unwritten_ids = {item["LogID"]["S"] for item in unwritten}
+    written = []
+    failed = []
+    for i, item in enumerate(items):
+        log_id = item["LogID"]["S"]
+        if log_id in unwritten_ids:
+            failed.append({"index": i, "id": log_id})
+        else:
+            written.append({"id": log_id, "dateTime": item["DateTime"]["S"]})
+    return {
+        # 207 when some entries were stored, 503 when none were
+        "statusCode": 207 if written else 503,
+        "headers": _JSON_HEADERS,
+        "body": orjson.dumps(
+            {
+                "message": "Some log entries were not written; "
+                "retry the failed entries with their id",
+                "count": len(written),
+                "logs": written,
+                "failed": failed,
             }
-        ),
+        ).decode(),
     }
@@ -1,11 +1,12 @@
 """Log Service CDK Stack.
 
-Creates a DynamoDB table with a GSI for time-based queries,
+Creates a DynamoDB table keyed for time-based queries,
 two Lambda functions (ingest + read_recent) with Function URLs,
 and the necessary IAM permissions.
 """
 
 from aws_cdk import (
+    BundlingOptions,
     CfnOutput,
     Duration,
     RemovalPolicy,
@@ -15,6 +16,43 @@ from aws_cdk import (
 )
 from constructs import Construct
 
+# Number of LogType partitions ("LOG#0".."LOG#9") writes are spread across
+LOG_SHARD_COUNT = 10
+
+# Graviton: better price-performance than x86_64 on Lambda
+LAMBDA_ARCHITECTURE = lambda_.Architecture.ARM_64
+
+
+def _lambda_code(path: str) -> lambda_.Code:
+    """Package a Lambda directory with its requirements.txt deps.
+
+    index.py is compiled to a native extension with mypyc. The extension
+    module takes precedence over index.py on import, so "index.handler"
+    resolves to the compiled code.
+    """
+    return lambda_.Code.from_asset(
+        path,
+        bundling=BundlingOptions(
+            image=lambda_.Runtime.PYTHON_3_12.bundling_image,
+            # Build native wheels and the mypyc extension for the target CPU
+            platform=LAMBDA_ARCHITECTURE.docker_platform,
+            command=[
+                "bash",
+                "-c",
+                "pip install --no-cache-dir -r requirements.txt -t /asset-output"
+                " && pip install --no-cache-dir mypy setuptools -t /tmp/mypyc"
+                " && cp -au . /asset-output"
+                # Compile outside /asset-output so mypy treats the bundled
+                # deps as installed packages rather than project sources
+                " && mkdir -p /tmp/mypyc-build && cp index.py /tmp/mypyc-build"
+                " && cd /tmp/mypyc-build"
+                " && PYTHONPATH=/tmp/mypyc:/asset-output"
+                " python -m mypyc --ignore-missing-imports index.py"
+                " && cp index.*.so /asset-output",
+            ],
+        ),
+    )
+
 
 class LogServiceStack(Stack):
     def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
@@ -23,29 +61,25 @@ class LogServiceStack(Stack):
         # ---------------------------------------------------------------
         # DynamoDB Table
         # ---------------------------------------------------------------
+        # LogType is "LOG#<n>" for one of LOG_SHARD_COUNT shards, so writes
+        # spread over several partitions instead of a single hot one.
+        # LogID starts with a hex timestamp, so it sorts by creation time
+        # and each shard can be queried newest-first without a secondary
+        # index.
         log_table = dynamodb.Table(
             self,
             "LogTable",
-            table_name="LogTable",
-            partition_key=dynamodb.Attribute(
-                name="LogID", type=dynamodb.AttributeType.STRING
-            ),
-            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
-            removal_policy=RemovalPolicy.DESTROY,
-        )
-
-        # GSI for querying the most recent logs sorted by DateTime.
-        # LogType is always "LOG" — a fixed partition key that collects
-        # all entries so we can sort by DateTime across the whole table.
-        log_table.add_global_secondary_index(
-            index_name="DateTimeIndex",
+            # Renamed with the key schema change: CloudFormation cannot
+            # replace a custom-named table in place.
+            table_name="LogTableV2",
             partition_key=dynamodb.Attribute(
                 name="LogType", type=dynamodb.AttributeType.STRING
             ),
             sort_key=dynamodb.Attribute(
-                name="DateTime", type=dynamodb.AttributeType.STRING
+                name="LogID", type=dynamodb.AttributeType.STRING
             ),
-            projection_type=dynamodb.ProjectionType.ALL,
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            removal_policy=RemovalPolicy.DESTROY,
         )
 
         # ---------------------------------------------------------------
@@ -56,13 +90,19 @@ class LogServiceStack(Stack):
             "IngestFunction",
             function_name="log-service-ingest",
             runtime=lambda_.Runtime.PYTHON_3_12,
+            architecture=LAMBDA_ARCHITECTURE,
             handler="index.handler",
-            code=lambda_.Code.from_asset("lambda/ingest"),
+            code=_lambda_code("lambda/ingest"),
             environment={
                 "TABLE_NAME": log_table.table_name,
+                "SHARD_COUNT": str(LOG_SHARD_COUNT),
+                # Set to DEBUG to log full event payloads on errors
+                "LOG_LEVEL": "INFO",
             },
             timeout=Duration.seconds(10),
-            memory_size=128,
+            # Lambda CPU scales with memory; 512MB is plenty for a mostly
+            # I/O-bound put and cuts cold-start import time
+            memory_size=512,
         )
 
         # Grant the ingest function write access to the table
@@ -81,13 +121,19 @@ class LogServiceStack(Stack):
             "ReadRecentFunction",
             function_name="log-service-read-recent",
             runtime=lambda_.Runtime.PYTHON_3_12,
+            architecture=LAMBDA_ARCHITECTURE,
             handler="index.handler",
-            code=lambda_.Code.from_asset("lambda/read_recent"),
+            code=_lambda_code("lambda/read_recent"),
             environment={
                 "TABLE_NAME": log_table.table_name,
+                "SHARD_COUNT": str(LOG_SHARD_COUNT),
+                # Set to DEBUG to log full event payloads on errors
+                "LOG_LEVEL": "INFO",
             },
             timeout=Duration.seconds(10),
-            memory_size=128,
+            # Lambda CPU scales with memory; the extra CPU speeds up the
+            # per-shard fan-out, merge and JSON encoding of 100 entries
+            memory_size=1024,
         )
 
         # Grant the read function read access to the table